@@ -14,11 +14,833 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import itertools
+import os
+import queue
+import shutil
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from functools import cached_property, lru_cache
 from pathlib import Path
+from types import MappingProxyType
 from conan import ConanFile
-from conan.tools.files import get, download, copy, chmod
-from conan.errors import ConanInvalidConfiguration
+from conan.errors import ConanException, ConanInvalidConfiguration
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Build platforms with pre-compiled LLVM binaries
+_SUPPORTED_BUILD_OS = frozenset({"Linux", "Macos", "Windows"})
+
+_SUPPORTED_BUILD_ARCH = MappingProxyType({
+    "Linux": frozenset({"armv8", "x86_64"}),
+    "Macos": frozenset({"armv8", "x86_64"}),
+    "Windows": frozenset({"armv8", "x86_64"}),
+})
+
+# Architecture-specific flags for ARM Cortex-M
+_ARCH_CONFIGS = {
+    "cortex-m0": {
+        "target": "armv6m-none-eabi",
+        "cpu": "cortex-m0",
+        "float_abi": "soft"
+    },
+    "cortex-m0plus": {
+        "target": "armv6m-none-eabi",
+        "cpu": "cortex-m0plus",
+        "float_abi": "soft"
+    },
+    "cortex-m1": {
+        "target": "armv6m-none-eabi",
+        "cpu": "cortex-m1",
+        "float_abi": "soft"
+    },
+    "cortex-m3": {
+        "target": "armv7m-none-eabi",
+        "cpu": "cortex-m3",
+        "float_abi": "soft"
+    },
+    "cortex-m4": {
+        "target": "armv7em-none-eabi",
+        "cpu": "cortex-m4",
+        "float_abi": "soft"
+    },
+    "cortex-m4f": {
+        "target": "armv7em-none-eabihf",
+        "cpu": "cortex-m4",
+        "float_abi": "hard",
+        "fpu": "fpv4-sp-d16"
+    },
+    "cortex-m7": {
+        "target": "armv7em-none-eabi",
+        "cpu": "cortex-m7",
+        "float_abi": "soft"
+    },
+    "cortex-m7f": {
+        "target": "armv7em-none-eabihf",
+        "cpu": "cortex-m7",
+        "float_abi": "hard",
+        "fpu": "fpv5-sp-d16"
+    },
+    "cortex-m7d": {
+        "target": "armv7em-none-eabihf",
+        "cpu": "cortex-m7",
+        "float_abi": "hard",
+        "fpu": "fpv5-d16"
+    },
+    "cortex-m23": {
+        "target": "armv8m.base-none-eabi",
+        "cpu": "cortex-m23",
+        "float_abi": "soft"
+    },
+    "cortex-m33": {
+        "target": "armv8m.main-none-eabi",
+        "cpu": "cortex-m33",
+        "float_abi": "soft"
+    },
+    "cortex-m33f": {
+        "target": "armv8m.main-none-eabihf",
+        "cpu": "cortex-m33",
+        "float_abi": "hard",
+        "fpu": "fpv5-sp-d16"
+    },
+    "cortex-m35pf": {
+        "target": "armv8m.main-none-eabihf",
+        "cpu": "cortex-m35p",
+        "float_abi": "hard",
+        "fpu": "fpv5-sp-d16"
+    },
+    "cortex-m55": {
+        "target": "armv8.1m.main-none-eabi",
+        "cpu": "cortex-m55",
+        "float_abi": "soft"
+    },
+    "cortex-m85": {
+        "target": "armv8.1m.main-none-eabi",
+        "cpu": "cortex-m85",
+        "float_abi": "soft"
+    },
+}
+
+
+def _arch_flags(config: dict) -> tuple:
+    # Add target triple, CPU specification and float ABI. The triple is its
+    # own list entry so build systems that pass each entry as a single
+    # argument (Meson, for one) hand clang two arguments as it expects.
+    FLAGS = (
+        "-target", config["target"],
+        f"-mcpu={config['cpu']}",
+        f"-mfloat-abi={config['float_abi']}",
+    )
+    # Add FPU if specified
+    if "fpu" in config:
+        FLAGS += (f"-mfpu={config['fpu']}",)
+    return FLAGS
+
+
+# The flag strings are formatted once at import time so package_info() does not
+# rebuild them for every consumer in the graph.
+_ARCH_MAP = MappingProxyType({
+    arch: {**config, "flags": _arch_flags(config)}
+    for arch, config in _ARCH_CONFIGS.items()
+})
+
+# ARM Cortex-M architectures served by the ARM Embedded LLVM fork
+_CORTEX_M_ARCHES = frozenset({
+    "cortex-m0", "cortex-m0plus", "cortex-m1",
+    "cortex-m3", "cortex-m4", "cortex-m4f",
+    "cortex-m7", "cortex-m7f", "cortex-m7d",
+    "cortex-m23", "cortex-m33", "cortex-m33f",
+    "cortex-m35p", "cortex-m35pf",
+    "cortex-m55", "cortex-m85",
+})
+
+# (os, arch) targets that need an LLVM variant other than upstream
+_VARIANT_TABLE = MappingProxyType({
+    ("baremetal", arch): "arm-embedded" for arch in _CORTEX_M_ARCHES
+})
+
+# Parts of the LLVM releases removed by the slim option. Compiling, linking
+# and the binutils replacements never need them, they exist for building
+# against LLVM itself. The ARM runtimes and libc++, including the sources of
+# its std module, are kept.
+_SLIM_PRUNE = (
+    "bin/bugpoint*",
+    "bin/clang-check*",
+    "bin/clang-repl*",
+    "bin/clangd*",
+    "bin/flang*",
+    "bin/llvm-c-test*",
+    "bin/llvm-lto*",
+    "bin/mlir-*",
+    "bin/scan-build*",
+    "bin/scan-view*",
+    "**/*.pdb",
+    "include/clang",
+    "include/clang-c",
+    "include/flang",
+    "include/lld",
+    "include/llvm",
+    "include/llvm-c",
+    "include/mlir*",
+    "lib/cmake",
+    "lib/libLLVM*.a",
+    "lib/libMLIR*.a",
+    "lib/libclang*.a",
+    "lib/liblld*.a",
+    "lib/LLVM*.lib",
+    "lib/clang*.lib",
+    "lib/lld*.lib",
+    "libexec",
+    # Only the documentation and tool data, share/libc++ holds the std
+    # module sources that lib/libc++.modules.json points at.
+    "share/doc",
+    "share/man",
+    "share/opt-viewer",
+    "share/scan-build",
+    "share/scan-view",
+)
+
+_TargetInfo = namedtuple("_TargetInfo", "os arch variant")
+
+
+# Options that add_common_flags() turns into flags, see _common_flags()
+_COMMON_FLAG_OPTIONS = (
+    "lto",
+    "thin_lto",
+    "fat_lto",
+    "function_sections",
+    "data_sections",
+    "gc_sections",
+    "icf",
+    "strip_build_id",
+)
+
+
+@lru_cache(maxsize=None)
+def _common_flags(target_os: str, cross_building: bool,
+                  enabled: frozenset) -> tuple:
+    """Returns the (compile, link) flags every target gets for the options
+    in enabled
+
+    The flags only depend on the arguments, so each configuration is worked
+    out once per Conan process, however many times package_info() runs.
+    """
+    ELF = target_os not in ("Macos", "Windows")
+    COMPILE_FLAGS = []
+    LINK_FLAGS = ["-fuse-ld=lld"]
+
+    if "lto" in enabled:
+        LTO = "-flto=thin" if "thin_lto" in enabled else "-flto"
+        COMPILE_FLAGS.append(LTO)
+        LINK_FLAGS.append(LTO)
+
+        # Fat LTO objects only exist for ELF. The link needs the flag as
+        # well, otherwise lld links the native sections and skips LTO.
+        if "fat_lto" in enabled and ELF:
+            COMPILE_FLAGS.append("-ffat-lto-objects")
+            LINK_FLAGS.append("-ffat-lto-objects")
+
+    if "function_sections" in enabled:
+        COMPILE_FLAGS.append("-ffunction-sections")
+
+    if "data_sections" in enabled:
+        COMPILE_FLAGS.append("-fdata-sections")
+
+    if "gc_sections" in enabled and cross_building:
+        if target_os == "Macos":
+            LINK_FLAGS.append("-Wl,-dead_strip")
+            LINK_FLAGS.append("-Wl,-dead_strip_dylibs")
+        elif target_os != "Windows":
+            LINK_FLAGS.append("-Wl,--gc-sections")
+        # LLVM will apply gc-sections automatically for Windows
+
+    # The Mach-O and COFF linkers have their own folding rules, only ask for
+    # it where lld's ELF port is used.
+    if "icf" in enabled and ELF:
+        LINK_FLAGS.append("-Wl,--icf=safe")
+
+    if "strip_build_id" in enabled and ELF:
+        LINK_FLAGS.append("-Wl,--build-id=none")
+
+    return tuple(COMPILE_FLAGS), tuple(LINK_FLAGS)
+
+
+def _merge_move(src: Path, dst: Path):
+    """Move the contents of src into dst, merging with folders already there"""
+    dst.mkdir(parents=True, exist_ok=True)
+    for entry in src.iterdir():
+        target = dst / entry.name
+        if entry.is_dir() and not entry.is_symlink() and target.is_dir():
+            _merge_move(entry, target)
+        else:
+            shutil.move(entry, target)
+
+
+def _toolchain_folders(root: Path) -> list:
+    """The LLVM-*/ATfE-* toolchain folders at the top of root, or one level
+    down inside the folder named after the disk image's volume
+
+    The volume folder can carry the toolchain's name as well, so only folders
+    with a bin folder count, and nothing inside a folder already found.
+    """
+    FOLDERS = []
+    for pattern in ("LLVM-*", "ATfE-*", "*/LLVM-*", "*/ATfE-*"):
+        for path in sorted(root.glob(pattern)):
+            if (path / "bin").is_dir() and not any(
+                    folder in path.parents for folder in FOLDERS):
+                FOLDERS.append(path)
+    return FOLDERS
+
+
+def _parallel_copy_tree(sources, dst: Path):
+    """Copy the contents of every folder in sources into dst with several
+    files in flight at once
+
+    Hides the per-file open/read latency of slow sources such as a mounted
+    disk image. Folders are created up front so workers never race on them.
+    """
+    FILES = []
+    for src in sources:
+        for path in src.rglob("*"):
+            target = dst / path.relative_to(src)
+            if path.is_symlink():
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.unlink(missing_ok=True)
+                target.symlink_to(os.readlink(path))
+            elif path.is_dir():
+                target.mkdir(parents=True, exist_ok=True)
+            else:
+                FILES.append((path, target))
+
+    WORKERS = min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        # list() re-raises the first copy error, if any
+        list(executor.map(lambda job: shutil.copy2(*job), FILES))
+
+
+def _clone_tree(src: Path, dst: Path):
+    """Copy src into dst, sharing file data with src where possible
+
+    Copy-on-write clones (reflinks on btrfs/xfs, clonefile on APFS) are tried
+    first through cp, then hard links, then a plain copy.
+    """
+    dst.mkdir(parents=True, exist_ok=True)
+    if sys.platform.startswith("linux"):
+        # --reflink=auto would fall back to a full copy on ext4 and report
+        # success, and hard links would never be tried.
+        CLONE = ["cp", "-a", "--reflink=always", f"{src}/.", str(dst)]
+    elif sys.platform == "darwin":
+        CLONE = ["cp", "-a", "-c", f"{src}/.", str(dst)]
+    else:
+        CLONE = None
+
+    def clear():
+        # Remove whatever a failed attempt left behind before the next one
+        for path in src.iterdir():
+            target = dst / path.name
+            if target.is_dir() and not target.is_symlink():
+                shutil.rmtree(target)
+            else:
+                target.unlink(missing_ok=True)
+
+    if CLONE and subprocess.run(CLONE,
+                                stderr=subprocess.DEVNULL).returncode == 0:
+        return
+
+    try:
+        clear()
+        shutil.copytree(src, dst, symlinks=True, dirs_exist_ok=True,
+                        copy_function=os.link)
+    except (OSError, shutil.Error):
+        clear()
+        shutil.copytree(src, dst, symlinks=True, dirs_exist_ok=True)
+
+
+def _link_tree(src: Path, dst: Path):
+    """Mirror the folders of src into dst and symlink every file back to src
+
+    Works across filesystems where hard links and reflinks do not, at the
+    cost of dst depending on src staying in place.
+    """
+    for path in src.rglob("*"):
+        target = dst / path.relative_to(src)
+        if path.is_dir() and not path.is_symlink():
+            target.mkdir(parents=True, exist_ok=True)
+            continue
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.unlink(missing_ok=True)
+        if path.is_symlink():
+            # Keep relative links relative so they resolve inside dst
+            target.symlink_to(os.readlink(path))
+        else:
+            target.symlink_to(path)
+
+
+@contextmanager
+def _file_lock(path: Path):
+    """Hold an exclusive lock on path for the duration of the block"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as lock_file:
+        if fcntl is None:
+            # No advisory locks on Windows, concurrent installs are not
+            # serialized there.
+            yield
+            return
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# Read size for streamed archives. Large blocks keep per-call overhead in the
+# hasher and decompressor low (OpenSSL uses SHA-NI/ARMv8 SHA instructions when
+# the CPU has them).
+_STREAM_BLOCK_SIZE = 1024 * 1024
+
+# Seconds a mirror gets to answer before another one is preferred
+_MIRROR_TIMEOUT = 5
+
+# Seconds a download connection may stall before it is given up, and retried
+_DOWNLOAD_TIMEOUT = 60
+
+
+def _urlopen(url: str, byte_range: str = None,
+             timeout: float = _DOWNLOAD_TIMEOUT):
+    """Opens url, only for the given range of bytes when byte_range is set
+
+    urllib.request drags in http.client and the email package, so it is only
+    imported once the recipe actually downloads something.
+    """
+    import urllib.request
+    HEADERS = {"Range": f"bytes={byte_range}"} if byte_range else {}
+    REQUEST = urllib.request.Request(url, headers=HEADERS)
+    return urllib.request.urlopen(REQUEST, timeout=timeout)
+
+
+def _file_sha256(path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(_STREAM_BLOCK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def _checksum_error(url: str, expected: str, computed: str) -> ConanException:
+    return ConanException(
+        f"sha256 signature failed for '{url}' file.\n"
+        f" Provided signature: {expected}\n"
+        f" Computed signature: {computed}")
+
+
+class _HashingReader:
+    """File-like wrapper that hashes every byte read from the wrapped stream
+
+    When a sink file is given, the bytes are also written to it, so a stream
+    can be saved to disk in the same pass that consumes it.
+    """
+
+    def __init__(self, stream, sink=None):
+        self._stream = stream
+        self._sink = sink
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._stream.read(size)
+        self.sha256.update(data)
+        if self._sink:
+            self._sink.write(data)
+        return data
+
+
+def _zstd_available() -> bool:
+    """Whether this Python can decompress zstd archives"""
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        pass
+
+    try:
+        # Python 3.14+
+        from compression import zstd  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _zstd_reader(stream):
+    """Wrap stream in a reader that returns its zstd-decompressed bytes"""
+    try:
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(
+            stream, read_size=_STREAM_BLOCK_SIZE)
+    except ImportError:
+        pass
+
+    try:
+        # Python 3.14+
+        from compression import zstd
+        return zstd.ZstdFile(stream)
+    except ImportError:
+        raise ConanException(
+            "Extracting .tar.zst archives requires Python 3.14 or the "
+            "'zstandard' package (pip install zstandard)")
+
+
+def _outside(root: str, path: str) -> bool:
+    """Whether path, relative to root, resolves to somewhere outside root"""
+    RESOLVED = os.path.realpath(os.path.join(root, path))
+    return os.path.commonpath([root, RESOLVED]) != root
+
+
+def _unpack_tar_stream(stream, mode: str, destination: str,
+                       extract_filter: str = None):
+    """Extract the tar archive read from stream into destination, without
+    its top level folder
+
+    extract_filter names the tarfile extraction filter to apply, "data" when
+    not given, so an archive cannot write outside destination even though it
+    is only verified once it has been extracted. Pythons that predate
+    extraction filters get the same containment check done here instead.
+    """
+    import tarfile
+
+    FILTER = getattr(tarfile, f"{extract_filter or 'data'}_filter", None)
+    ROOT = os.path.realpath(destination)
+
+    with tarfile.open(fileobj=stream, mode=mode,
+                      bufsize=_STREAM_BLOCK_SIZE) as archive:
+        if FILTER:
+            archive.extraction_filter = FILTER
+        for member in archive:
+            # Equivalent of strip_root=True: drop the top level folder
+            _, _, member.name = member.name.partition("/")
+            if not member.name:
+                continue
+            if member.islnk():
+                _, _, member.linkname = member.linkname.partition("/")
+
+            if FILTER is None and (
+                    os.path.isabs(member.name) or _outside(ROOT, member.name)
+                    or member.issym() and _outside(ROOT, os.path.join(
+                        os.path.dirname(member.name), member.linkname))
+                    or member.islnk() and _outside(ROOT, member.linkname)):
+                raise ConanException(
+                    f"Refusing to extract {member.name} outside "
+                    f"{destination}")
+
+            if member.islnk():
+                # A stale hard link cannot be replaced in place, and stream
+                # mode cannot seek back to copy the target.
+                Path(destination, member.name).unlink(missing_ok=True)
+            archive.extract(member, path=destination)
+
+
+class _BlockReader(ABC):
+    """Base for file-like readers that hand out blocks produced ahead of time
+
+    Subclasses implement _next_block(), returning b"" once the stream ends.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._eof = False
+
+    @abstractmethod
+    def _next_block(self) -> bytes:
+        """The next block of the stream"""
+
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            BLOCK = self._next_block()
+            self._eof = not BLOCK
+            self._buffer += BLOCK
+        if size < 0:
+            size = len(self._buffer)
+        DATA = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return DATA
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _PrefetchReader(_BlockReader):
+    """Reads a stream on a background thread, ahead of the consumer
+
+    Lets the network transfer carry on while the consumer is busy
+    decompressing and writing the previous blocks.
+    """
+
+    DEPTH = 8
+
+    def __init__(self, stream):
+        super().__init__()
+        self._stream = stream
+        self._closed = False
+        self._queue = queue.Queue(maxsize=self.DEPTH)
+        threading.Thread(target=self._pump, daemon=True).start()
+
+    def _put(self, item):
+        while not self._closed:
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def _pump(self):
+        try:
+            while not self._closed:
+                BLOCK = self._stream.read(_STREAM_BLOCK_SIZE)
+                self._put(BLOCK)
+                if not BLOCK:
+                    return
+        except Exception as error:
+            # Handed over to the consumer, which raises it from read()
+            self._put(error)
+
+    def _next_block(self) -> bytes:
+        ITEM = self._queue.get()
+        if isinstance(ITEM, Exception):
+            raise ITEM
+        return ITEM
+
+    def close(self):
+        self._closed = True
+        self._stream.close()
+
+
+class _ProcessPipe(_BlockReader):
+    """Feeds a stream through an external program such as xz or tar
+
+    A feeder thread copies the stream into the program while the consumer
+    reads from its output, so the program's work overlaps the download and
+    whatever the consumer does with the output. Reading to the end raises if
+    the program failed.
+    """
+
+    def __init__(self, command: list, stream, env: dict = None):
+        super().__init__()
+        self._command = command
+        self._error = None
+        self._process = subprocess.Popen(
+            command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env)
+        self._feeder = threading.Thread(
+            target=self._feed, args=(stream,), daemon=True)
+        self._feeder.start()
+
+    def _feed(self, stream):
+        try:
+            for block in iter(lambda: stream.read(_STREAM_BLOCK_SIZE), b""):
+                self._process.stdin.write(block)
+            self._process.stdin.close()
+        except BrokenPipeError:
+            # The decoder exited early, its exit status says why
+            pass
+        except Exception as error:
+            # Handed over to the consumer, which raises it from read()
+            self._error = error
+            self._process.kill()
+
+    def _next_block(self) -> bytes:
+        BLOCK = self._process.stdout.read1(_STREAM_BLOCK_SIZE)
+        if BLOCK:
+            return BLOCK
+        self._feeder.join()
+        if self._error:
+            raise self._error
+        if self._process.wait() != 0:
+            raise ConanException(
+                f"{self._command[0]} failed to process the archive")
+        return BLOCK
+
+    def close(self):
+        if self._process.poll() is None:
+            self._process.kill()
+        self._process.wait()
+        self._process.stdout.close()
+
+
+class _RangeReader(_BlockReader):
+    """File-like reader that fetches a URL as concurrent HTTP range requests
+
+    Chunks are downloaded ahead of the reader by a small thread pool and handed
+    out strictly in order, so callers see the same byte stream as a single GET.
+    Each worker keeps its connection alive between chunks, so only the first
+    chunk pays for the TCP and TLS handshakes.
+
+    resolved_url is where url ended up after redirects. GitHub release assets
+    redirect to signed CDN addresses that expire after a few minutes, so once
+    the resolved address is refused, url is resolved again and the chunk is
+    fetched from the new address.
+    """
+
+    CHUNK_SIZE = 4 * 1024 * 1024
+    WORKERS = 4
+
+    def __init__(self, url: str, size: int, resolved_url: str = None):
+        super().__init__()
+        self._url = url
+        self._size = size
+        self._next_offset = 0
+        self._pending = deque()
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._source = self._make_source(resolved_url or url)
+        self._executor = ThreadPoolExecutor(max_workers=self.WORKERS)
+        # Keep twice as many chunks in flight as workers so a worker never
+        # idles while the reader drains the head of the queue.
+        for _ in range(self.WORKERS * 2):
+            self._schedule()
+
+    @staticmethod
+    def _make_source(url: str):
+        """(url, target) where target is the (connection class, host, path)
+        to fetch url from, or None when it has to go through urllib, which
+        knows about proxies"""
+        import http.client
+        import urllib.parse
+        import urllib.request
+
+        PARTS = urllib.parse.urlsplit(url)
+        CONNECTION = {
+            "http": http.client.HTTPConnection,
+            "https": http.client.HTTPSConnection,
+        }.get(PARTS.scheme)
+        if (CONNECTION is None or PARTS.scheme in urllib.request.getproxies()
+                and not urllib.request.proxy_bypass(PARTS.hostname)):
+            return url, None
+
+        PATH = PARTS.path or "/"
+        if PARTS.query:
+            PATH += f"?{PARTS.query}"
+        return url, (CONNECTION, PARTS.netloc, PATH)
+
+    def _refresh(self, stale_source):
+        """Resolve url again, unless another worker already did so since
+        stale_source was current"""
+        with self._lock:
+            if self._source is stale_source:
+                with _urlopen(self._url, "0-0") as response:
+                    self._source = self._make_source(response.geturl())
+            return self._source
+
+    def _get_keep_alive(self, target, byte_range: str):
+        import http.client
+
+        CONNECTION, HOST, PATH = target
+        for attempt in range(2):
+            connection = getattr(self._local, "connection", None)
+            if connection is None or self._local.key != (CONNECTION, HOST):
+                if connection is not None:
+                    connection.close()
+                connection = CONNECTION(HOST, timeout=_DOWNLOAD_TIMEOUT)
+                self._local.connection = connection
+                self._local.key = (CONNECTION, HOST)
+                with self._lock:
+                    self._connections.append(connection)
+            try:
+                connection.request(
+                    "GET", PATH, headers={"Range": f"bytes={byte_range}"})
+                response = connection.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError) as error:
+                connection.close()
+                self._local.connection = None
+                # The server may have dropped the idle connection since the
+                # last chunk, so try once more on a fresh one.
+                if attempt:
+                    raise OSError(f"{error!r} for bytes {byte_range} of "
+                                  f"{self._url}") from error
+
+    def _get(self, source, byte_range: str):
+        """HTTP status and body of a request for byte_range of source"""
+        import urllib.error
+
+        URL, TARGET = source
+        if TARGET:
+            return self._get_keep_alive(TARGET, byte_range)
+        try:
+            with _urlopen(URL, byte_range) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as error:
+            error.close()
+            return error.code, b""
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        BYTE_RANGE = f"{start}-{end}"
+        SOURCE = self._source
+        STATUS, DATA = self._get(SOURCE, BYTE_RANGE)
+        if STATUS in (403, 410):
+            # The signed address url redirected to has expired
+            STATUS, DATA = self._get(self._refresh(SOURCE), BYTE_RANGE)
+        if STATUS != 206:
+            raise OSError(f"HTTP {STATUS} for bytes {BYTE_RANGE} of "
+                          f"{self._url}")
+        if len(DATA) != end - start + 1:
+            raise OSError(f"Short read for bytes {BYTE_RANGE} of {self._url}")
+        return DATA
+
+    def _schedule(self):
+        if self._next_offset >= self._size:
+            return
+        END = min(self._next_offset + self.CHUNK_SIZE, self._size) - 1
+        self._pending.append(
+            self._executor.submit(self._fetch, self._next_offset, END))
+        self._next_offset = END + 1
+
+    def _next_block(self) -> bytes:
+        if not self._pending:
+            return b""
+        BLOCK = self._pending.popleft().result()
+        self._schedule()
+        return BLOCK
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+
+
+def _open_url(url: str):
+    """Opens url as a file-like reader of its contents"""
+    # Probe with a one byte range request. Servers that honour it report the
+    # full size in Content-Range and the file is fetched over several
+    # connections. Anything else already sent the whole file, so the probe
+    # response is read ahead on a background thread instead.
+    response = _urlopen(url, "0-0")
+    if getattr(response, "status", None) != 206:
+        return _PrefetchReader(response)
+
+    response.close()
+    _, _, TOTAL = response.headers.get("Content-Range", "").partition("/")
+    if TOTAL.isdigit():
+        return _RangeReader(url, int(TOTAL), resolved_url=response.geturl())
+
+    # The range was honoured but the size left out ("bytes 0-0/*"), so the
+    # file cannot be split up and is fetched in one piece.
+    return _PrefetchReader(_urlopen(url))
 
 
 class LLVMToolchainPackage(ConanFile):
@@ -36,88 +858,102 @@ class LLVMToolchainPackage(ConanFile):
         "default_arch": [True, False],
         "default_linker_script": [True, False],
         "lto": [True, False],
+        "thin_lto": [True, False],
+        "fat_lto": [True, False],
         "function_sections": [True, False],
         "data_sections": [True, False],
         "gc_sections": [True, False],
+        "icf": [True, False],
+        "strip_build_id": [True, False],
         "use_semihosting": [True, False],
+        "slim": [True, False],
     }
 
     default_options = {
         "default_arch": True,
         "default_linker_script": True,
         "lto": True,
+        "thin_lto": False,
+        "fat_lto": False,
         "function_sections": True,
         "data_sections": True,
         "gc_sections": True,
-        "use_semihosting": True
+        "icf": True,
+        "strip_build_id": False,
+        "use_semihosting": True,
+        "slim": False,
     }
 
     options_description = {
         "default_arch": "Automatically inject architecture-appropriate -target and -mcpu arguments into compilation flags.",
         "lto": "Enable LTO support in binaries and intermediate files (.o and .a files)",
+        "thin_lto": "Use ThinLTO (-flto=thin) instead of full LTO when lto is enabled. ThinLTO optimizes modules in parallel and links much faster, at the cost of a slightly less thorough optimization.",
+        "fat_lto": "Emit fat LTO objects (-ffat-lto-objects) when lto is enabled, so .o and .a files also carry regular object code and can be linked or inspected by tools without LTO support. Only applies to ELF targets.",
         "default_linker_script": "Automatically specify what the default linker script in order to allow projects without a linker script to link without error. If the user specifies their own linker script(s) via the -T argument, that default linker script will be ignored and the supplied linker script(s) will be used. Disabling this flag is not necessary when building applications with custom linker scripts. Only use this if you have multiple custom linker scripts and a default linker script you'd like to override against the supplied one from this toolchain library.",
         "function_sections": "Enable -ffunction-sections which splits each function into their own subsection allowing link time garbage collection.",
         "data_sections": "Enable -fdata-sections which splits each statically defined block memory into their own subsection allowing link time garbage collection.",
         "gc_sections": "Enable garbage collection at link stage. Only useful if at least function_sections and data_sections is enabled.",
+        "icf": "Enable safe identical code folding at link stage (-Wl,--icf=safe), merging functions with identical code whose address is never taken. Only applies to ELF targets and is most effective with function_sections enabled.",
+        "strip_build_id": "Pass -Wl,--build-id=none so no build id note is written into linked ELF images. Saves a few bytes per binary, but symbolizers and debuginfod can no longer match binaries to their debug info.",
         "use_semihosting": "Inject command line flags to enable semihosting for your architecture. This is only used when the os=baremetal.",
+        "slim": "Remove the parts of the LLVM release that are only needed to develop against LLVM itself (its static libraries, headers and CMake files) along with rarely used tools. Cuts the package size considerably without affecting compiling or linking.",
     }
 
+    # Flag setup method for each target os. Baremetal is only handled for
+    # Cortex-M, see package_info().
+    _OS_SETUP = MappingProxyType({
+        "Macos": "setup_mac_osx",
+        "Linux": "setup_linux",
+        "Windows": "setup_windows",
+    })
+
     def validate(self):
-        supported_build_operating_systems = ["Linux", "Macos", "Windows"]
-        if not self.settings_build.os in supported_build_operating_systems:
+        build_os = str(self.settings_build.os)
+        build_arch = str(self.settings_build.arch)
+
+        if build_os not in _SUPPORTED_BUILD_OS:
             raise ConanInvalidConfiguration(
-                f"The build os '{self.settings_build.os}' is not supported. "
+                f"The build os '{build_os}' is not supported. "
                 "Pre-compiled binaries are only available for "
-                f"{supported_build_operating_systems}."
+                f"{sorted(_SUPPORTED_BUILD_OS)}."
             )
 
-        supported_build_architectures = {
-            "Linux": ["armv8", "x86_64"],
-            "Macos": ["armv8", "x86_64"],
-            "Windows": ["armv8", "x86_64"],
-        }
-
-        if (
-            not self.settings_build.arch
-            in supported_build_architectures[str(self.settings_build.os)]
-        ):
-            build_os = str(self.settings_build.os)
+        if build_arch not in _SUPPORTED_BUILD_ARCH[build_os]:
             raise ConanInvalidConfiguration(
-                f"The build architecture '{self.settings_build.arch}' "
-                f"is not supported for {self.settings_build.os}. "
+                f"The build architecture '{build_arch}' "
+                f"is not supported for {build_os}. "
                 "Pre-compiled binaries are only available for "
-                f"{supported_build_architectures[build_os]}."
+                f"{sorted(_SUPPORTED_BUILD_ARCH[build_os])}."
             )
 
         # Validate version-variant compatibility
         if self.settings_target:
             variant = self._determine_llvm_variant()
 
-            try:
-                available_variants = list(
-                    self.conan_data['sources'][self.version].keys())
-                if variant not in available_variants:
-                    target_arch = self.settings_target.get_safe('arch')
-                    target_os = self.settings_target.get_safe('os')
-                    raise ConanInvalidConfiguration(
-                        f"Version {self.version} does not support the '{variant}' variant "
-                        f"required for target {target_os}/{target_arch}. "
-                        f"Available variants for {self.version}: {available_variants}. "
-                        f"Hint: ARM Cortex-M targets require version 20.1.0."
-                    )
-            except KeyError:
+            VERSION_SOURCES = self.conan_data['sources'].get(self.version)
+            if VERSION_SOURCES is None:
                 raise ConanInvalidConfiguration(
                     f"Version {self.version} is not defined in conandata.yml"
                 )
 
+            if variant not in VERSION_SOURCES:
+                raise ConanInvalidConfiguration(
+                    f"Version {self.version} does not support the '{variant}' variant "
+                    f"required for target {self._target_info.os}/{self._target_info.arch}. "
+                    f"Available variants for {self.version}: {list(VERSION_SOURCES)}. "
+                    f"Hint: ARM Cortex-M targets require version 20.1.0."
+                )
+
     def source(self):
         pass
 
     def build(self):
         pass
 
-    def _determine_llvm_variant(self):
-        """Determine which LLVM variant to download based on target architecture"""
+    @cached_property
+    def _target_info(self) -> _TargetInfo:
+        """The platform the toolchain generates code for, along with the LLVM
+        variant that supports it"""
         # The command for cross compiling this project for a particular binary,
         # in order to fetch the binaries for that version of LLVM use:
         #
@@ -126,73 +962,335 @@ class LLVMToolchainPackage(ConanFile):
         # This will set the settings_target which will download the appropriate
         # fork of LLVM for that architecture.
         if not self.settings_target:
+            # Native build - target is same as host
             self.output.debug("Using upstream LLVM binary")
-            return "upstream"
+            return _TargetInfo(str(self.settings.os), str(self.settings.arch),
+                               "upstream")
 
         TARGET_OS = self.settings_target.get_safe("os")
         TARGET_ARCH = self.settings_target.get_safe("arch")
 
-        self.output.debug(
-            f"host: os: '{TARGET_OS}', architecture: '{TARGET_ARCH}'")
-
-        # ARM Cortex-M baremetal gets special ARM Embedded Toolchain
-        if TARGET_OS == "baremetal" and TARGET_ARCH in [
-            "cortex-m0", "cortex-m0plus", "cortex-m1",
-            "cortex-m3", "cortex-m4", "cortex-m4f",
-            "cortex-m7", "cortex-m7f", "cortex-m7d",
-            "cortex-m23", "cortex-m33", "cortex-m33f",
-            "cortex-m35p", "cortex-m35pf",
-            "cortex-m55", "cortex-m85",
-        ]:
-            self.output.debug("Using ARM Embedded LLVM fork")
-            return "arm-embedded"
-
+        # ARM Cortex-M baremetal gets special ARM Embedded Toolchain.
         # Everything else uses regular LLVM
         # This includes:
         # - RISC-V (riscv32, riscv64)
         # - AVR (avr)
         # - Other ARM variants (cortex-a, etc.)
         # - Host builds
-        self.output.debug("Using upstream LLVM binary")
-        return "upstream"
+        VARIANT = _VARIANT_TABLE.get((TARGET_OS, TARGET_ARCH), "upstream")
+
+        self.output.debug(
+            f"host: os: '{TARGET_OS}', architecture: '{TARGET_ARCH}', "
+            f"LLVM variant: '{VARIANT}'")
+        return _TargetInfo(TARGET_OS, TARGET_ARCH, VARIANT)
+
+    def _determine_llvm_variant(self):
+        """Determine which LLVM variant to download based on target architecture"""
+        # A native build always uses upstream LLVM. Answering that without
+        # _target_info keeps package_id(), which may not read self.settings,
+        # away from the host settings.
+        if not self.settings_target:
+            return "upstream"
+        return self._target_info.variant
 
-    def _extract_macos_dmg(self, url: str, sha256: str):
+    def _extract_macos_dmg(self, url: str, sha256: str, destination: str):
         # Download and store  to source folder just for storage
         LOCAL_DMG_FILE = Path(self.source_folder) / "llvm.dmg"
-        download(self, url, LOCAL_DMG_FILE)
+        self._cached_download(url, sha256, LOCAL_DMG_FILE)
 
-        # Mount the DMG file system onto the build folder
-        subprocess.run(
-            ["hdiutil", "attach", str(LOCAL_DMG_FILE), "-mountpoint",
-             self.build_folder, "-nobrowse", "-readonly", "-quiet"])
-
-        # Copy contents from LLVM directory to package folder
-        PATHS = Path(self.build_folder).glob("LLVM-*")
-        for path in PATHS:
-            self.output.info(f"📁 COPYING Contents of {path}")
-            copy(self, "**", src=path, dst=self.package_folder, keep_path=True)
-        # Copy contents from LLVM directory to package folder
-        PATHS = Path(self.build_folder).glob("ATfE-*")
-        for path in PATHS:
-            self.output.info(f"📁 COPYING Contents of {path}")
-            copy(self, "**", src=path, dst=self.package_folder, keep_path=True)
-
-        # Detach DMG
-        subprocess.run(
-            ["hdiutil", "detach", self.build_folder, "-force", "-quiet"])
+        # 7-Zip reads the UDIF image directly, which skips mounting the image
+        # and copying every file out of it. Fall back to hdiutil when 7-Zip is
+        # not installed or cannot make sense of the image.
+        SEVEN_ZIP = shutil.which("7zz") or shutil.which("7z")
+        if not (SEVEN_ZIP and self._extract_dmg_with_7zip(
+                SEVEN_ZIP, LOCAL_DMG_FILE, destination)):
+            self._extract_dmg_with_hdiutil(LOCAL_DMG_FILE, destination)
 
         # Delete DMG file
         Path(LOCAL_DMG_FILE).unlink()
 
-    def _extract(self, url: str, sha256: str):
-        if url.endswith(".dmg"):
-            self._extract_macos_dmg(url=url, sha256=sha256)
+    def _extract_dmg_with_7zip(self, seven_zip: str, dmg_file: Path,
+                               destination: str) -> bool:
+        EXTRACT_FOLDER = Path(self.build_folder) / "dmg"
+        RESULT = subprocess.run(
+            [seven_zip, "x", str(dmg_file), f"-o{EXTRACT_FOLDER}", "-snl",
+             "-y", "-bso0", "-bsp0"])
+        if RESULT.returncode != 0:
+            self.output.warning(f"{seven_zip} failed to extract {dmg_file}")
+            return False
+
+        PATHS = _toolchain_folders(EXTRACT_FOLDER)
+        if not PATHS:
+            self.output.warning(f"No toolchain folder found in {dmg_file}")
+            return False
+
+        try:
+            for path in PATHS:
+                self.output.info(f"📁 MOVING Contents of {path}")
+                _merge_move(path, Path(destination))
+        except OSError as error:
+            self.output.warning(f"Could not move the toolchain out of "
+                                f"{EXTRACT_FOLDER}: {error}")
+            return False
+        return True
+
+    def _extract_dmg_with_hdiutil(self, dmg_file: Path, destination: str):
+        # Mount the DMG file system onto the build folder. The image was
+        # already verified against conandata.yml, so hdiutil's own checksum
+        # and fsck passes over it are skipped.
+        subprocess.run(
+            ["hdiutil", "attach", str(dmg_file), "-mountpoint",
+             self.build_folder, "-nobrowse", "-readonly", "-noverify",
+             "-noautofsck", "-quiet"], check=True)
+
+        try:
+            # Copy contents from LLVM directory to package folder. Both
+            # folders share one pool of copy workers.
+            MOUNT = Path(self.build_folder)
+            PATHS = list(itertools.chain(MOUNT.glob("LLVM-*"),
+                                         MOUNT.glob("ATfE-*")))
+            for path in PATHS:
+                self.output.info(f"📁 COPYING Contents of {path}")
+            _parallel_copy_tree(PATHS, Path(destination))
+        finally:
+            # Detach DMG
+            subprocess.run(
+                ["hdiutil", "detach", self.build_folder, "-force", "-quiet"])
+
+    def _extract(self, url, sha256: str, destination: str):
+        # url is a list of mirrors when Conan downloads it and picks one
+        NAME = url if isinstance(url, str) else url[0]
+        if NAME.endswith(".dmg"):
+            self._extract_macos_dmg(url=url, sha256=sha256,
+                                    destination=destination)
             return
 
+        if NAME.endswith((".tar.xz", ".tar.zst")) and self._stream_downloads:
+            try:
+                self._stream_extract_tar(url=url, sha256=sha256,
+                                         destination=destination)
+                return
+            except Exception as error:
+                # Conan's unzip() only reads zstd from Python 3.14 on
+                if NAME.endswith(".tar.zst") and sys.version_info < (3, 14):
+                    raise
+                self.output.warning(f"Could not stream {url} ({error}), "
+                                    f"downloading it through Conan instead")
+                shutil.rmtree(destination, ignore_errors=True)
+
+        # Only needed when the archive is not streamed, so the module is not
+        # imported while resolving the graph.
+        from conan.tools.files import get
+
         # Download and extract the LLVM binary package
-        # All platforms use tar.xz archives now
         get(self, url, sha256=sha256, strip_root=True,
-            destination=self.package_folder)
+            destination=destination)
+
+    def _stream_extract_tar(self, url: str, sha256: str, destination: str):
+        # Decompress and unpack the archive while it is being downloaded rather
+        # than saving the whole tarball to disk first and extracting it after.
+        # The checksum is computed over the same bytes as they stream past.
+        ZSTD = url.endswith(".tar.zst")
+        CACHED = self._download_cache_file(sha256)
+
+        if CACHED is not None and CACHED.is_file():
+            self.output.info(f"Using cached download {CACHED}")
+            CHECKSUM, _ = self._stream_extract_tar_once(
+                CACHED.as_uri(), destination, ZSTD)
+            if CHECKSUM == sha256:
+                return
+            self.output.warning(f"Discarding corrupt cached file {CACHED}")
+            CACHED.unlink()
+            shutil.rmtree(destination, ignore_errors=True)
+
+        CHECKSUM, PARTIAL = self._retry_download(
+            url, lambda: self._stream_extract_tar_once(
+                url, destination, ZSTD, save_to=CACHED))
+
+        if CHECKSUM != sha256:
+            if PARTIAL:
+                PARTIAL.unlink()
+            # Nothing unpacked from an archive that failed verification may
+            # end up in a package.
+            shutil.rmtree(destination, ignore_errors=True)
+            raise _checksum_error(url, sha256, CHECKSUM)
+
+        if PARTIAL:
+            os.replace(PARTIAL, CACHED)
+
+    def _retry_download(self, url: str, attempt_download):
+        """Call attempt_download() until it succeeds or the retries allowed
+        by tools.files.download:retry run out"""
+        RETRIES = self.conf.get("tools.files.download:retry",
+                                check_type=int, default=2)
+        RETRY_WAIT = self.conf.get("tools.files.download:retry_wait",
+                                   check_type=int, default=5)
+
+        for attempt in range(RETRIES + 1):
+            try:
+                return attempt_download()
+            except OSError as error:
+                if attempt == RETRIES:
+                    raise ConanException(
+                        f"Error downloading file {url}: '{error}'")
+                self.output.warning(
+                    f"Error downloading file {url}: '{error}', "
+                    f"retrying in {RETRY_WAIT} seconds...")
+                time.sleep(RETRY_WAIT)
+
+    def _stream_extract_tar_once(self, url: str, destination: str, zstd: bool,
+                                 save_to: Path = None):
+        """Returns the archive's sha256 and, when save_to is given, the path
+        of the unverified copy of the archive that was written next to it"""
+        self.output.info(f"Downloading and extracting {url}")
+        if hashlib.sha256().__class__.__module__ != "_hashlib":
+            self.output.debug(
+                "hashlib is not backed by OpenSSL, sha256 verification will "
+                "not use hardware SHA extensions")
+
+        PARTIAL = None
+        sink = None
+        if save_to is not None:
+            save_to.parent.mkdir(parents=True, exist_ok=True)
+            sink = tempfile.NamedTemporaryFile(
+                dir=save_to.parent, suffix=".part", delete=False)
+            PARTIAL = Path(sink.name)
+
+        try:
+            with _open_url(url) as response:
+                reader = _HashingReader(response, sink)
+                EXTRACT_FILTER = self.conf.get("tools.files.unzip:filter")
+                XZ = None if zstd else shutil.which("xz")
+                TAR = self._system_tar() if XZ else None
+                if TAR:
+                    # Let the native tar extract the archive as well, it is
+                    # much faster than tarfile at creating thousands of files.
+                    # GNU tar passes XZ_OPT on to the xz it runs.
+                    Path(destination).mkdir(parents=True, exist_ok=True)
+                    with _ProcessPipe(
+                            [TAR, "-x", "-J", "-f", "-",
+                             "--strip-components=1", "-C", destination],
+                            reader, env={**os.environ, "XZ_OPT": "-T0"}
+                    ) as extraction:
+                        while extraction.read(_STREAM_BLOCK_SIZE):
+                            pass
+                elif zstd:
+                    # tarfile only learns zstd in Python 3.14, so decompress
+                    # ahead of it and hand it a plain tar stream.
+                    _unpack_tar_stream(_zstd_reader(reader), "r|",
+                                       destination, EXTRACT_FILTER)
+                elif XZ:
+                    # The lzma module decodes on the calling thread, xz runs
+                    # next to the extraction and with -T0 decodes multi-block
+                    # archives on every core.
+                    with _ProcessPipe([XZ, "-d", "-c", "-T0"],
+                                      reader) as decoded:
+                        _unpack_tar_stream(decoded, "r|", destination,
+                                           EXTRACT_FILTER)
+                        # xz pulls the download through the hash, so it has
+                        # to run to the end of its input
+                        while decoded.read(_STREAM_BLOCK_SIZE):
+                            pass
+                else:
+                    _unpack_tar_stream(reader, "r|xz", destination,
+                                       EXTRACT_FILTER)
+
+                # tarfile stops at the end-of-archive marker; hash what
+                # remains of the compressed stream so the checksum covers the
+                # whole file.
+                while reader.read(_STREAM_BLOCK_SIZE):
+                    pass
+        except BaseException:
+            if sink:
+                sink.close()
+                PARTIAL.unlink(missing_ok=True)
+            raise
+
+        if sink:
+            sink.close()
+        return reader.sha256.hexdigest(), PARTIAL
+
+    def _system_tar(self):
+        """The system tar, when it may extract archives instead of tarfile
+
+        Not used on Windows, or when tools.files.unzip:filter asks for an
+        extraction filter that only tarfile implements.
+        """
+        if sys.platform == "win32" or self.conf.get("tools.files.unzip:filter"):
+            return None
+        return shutil.which("tar")
+
+    def _download_cache_file(self, sha256: str):
+        """Location of the cached download with this sha256, or None when the
+        user.llvm:download_cache conf is not set"""
+        CACHE_FOLDER = self.conf.get("user.llvm:download_cache")
+        if not CACHE_FOLDER:
+            return None
+        return Path(CACHE_FOLDER) / sha256[:2] / sha256
+
+    @property
+    def _stream_downloads(self) -> bool:
+        """Whether the recipe downloads archives itself rather than through
+        Conan, which applies its proxy, certificate and download cache
+        settings but cannot unpack an archive while it downloads. Streamed
+        downloads that fail are retried through Conan."""
+        return self.conf.get("user.llvm:stream_download", default=True,
+                             check_type=bool)
+
+    def _download(self, url, sha256: str, filename: Path):
+        Path(filename).parent.mkdir(parents=True, exist_ok=True)
+        if self._stream_downloads:
+            try:
+                self._stream_download(url, sha256, filename)
+                return
+            except Exception as error:
+                self.output.warning(f"Could not stream {url} ({error}), "
+                                    f"downloading it through Conan instead")
+
+        from conan.tools.files import download
+        download(self, url, str(filename), sha256=sha256)
+
+    def _stream_download(self, url: str, sha256: str, filename: Path):
+        # Hash the bytes on their way to disk rather than reading the whole
+        # file back afterwards to verify it. An unverified file never
+        # appears under its final name.
+        FOLDER = Path(filename).parent
+
+        def attempt_download():
+            sink = tempfile.NamedTemporaryFile(dir=FOLDER, suffix=".part",
+                                               delete=False)
+            try:
+                with sink, _open_url(url) as response:
+                    reader = _HashingReader(response, sink)
+                    while reader.read(_STREAM_BLOCK_SIZE):
+                        pass
+            except BaseException:
+                Path(sink.name).unlink(missing_ok=True)
+                raise
+            return reader.sha256.hexdigest(), Path(sink.name)
+
+        self.output.info(f"Downloading {url}")
+        CHECKSUM, PARTIAL = self._retry_download(url, attempt_download)
+        if CHECKSUM != sha256:
+            PARTIAL.unlink()
+            raise _checksum_error(url, sha256, CHECKSUM)
+        os.replace(PARTIAL, filename)
+
+    def _cached_download(self, url: str, sha256: str, filename: Path):
+        CACHED = self._download_cache_file(sha256)
+        if CACHED is None:
+            self._download(url, sha256, filename)
+            return
+
+        if CACHED.is_file() and _file_sha256(CACHED) == sha256:
+            self.output.info(f"Using cached download {CACHED}")
+        else:
+            if CACHED.is_file():
+                self.output.warning(f"Discarding corrupt cached file {CACHED}")
+                CACHED.unlink()
+            self._download(url, sha256, CACHED)
+
+        shutil.copyfile(CACHED, filename)
 
     def _download_and_install_clang_scan_deps(self,
                                               build_os: str,
@@ -219,9 +1317,10 @@ class LLVMToolchainPackage(ConanFile):
 
         SCAN_DEPS_FILE_DESTINATION = Path(
             self.package_folder) / "bin" / FINAL_FILE_NAME
-        download(self, URL,
-                 sha256=CLANG_SCAN_DEPS_SHA256[self.version][BUILD],
-                 filename=SCAN_DEPS_FILE_DESTINATION)
+        self._cached_download(URL, CLANG_SCAN_DEPS_SHA256[self.version][BUILD],
+                              SCAN_DEPS_FILE_DESTINATION)
+
+        from conan.tools.files import chmod
         chmod(self, SCAN_DEPS_FILE_DESTINATION, execute=True)
 
     def package(self):
@@ -232,111 +1331,106 @@ class LLVMToolchainPackage(ConanFile):
         self.output.info(f'VARIANT: {VARIANT}')
         self.output.info(f'BUILD_OS: {BUILD_OS}, BUILD_ARCH: {BUILD_ARCH}')
 
-        URL = self.conan_data["sources"][self.version][VARIANT][BUILD_OS][BUILD_ARCH]["url"]
-        SHA256 = self.conan_data["sources"][self.version][VARIANT][BUILD_OS][BUILD_ARCH]["sha256"]
+        SOURCE = self.conan_data["sources"][self.version][VARIANT][BUILD_OS][BUILD_ARCH]
+        URL = SOURCE["url"]
+        SHA256 = SOURCE["sha256"]
+
+        # Prefer the zstd recompression of the archive when one is listed and
+        # this Python can decode it, as it unpacks several times faster than xz.
+        # Conan's own unzip() only reads zstd from Python 3.14 on.
+        ZSTD = (_zstd_available() if self._stream_downloads
+                else sys.version_info >= (3, 14))
+        if "zst_url" in SOURCE and ZSTD:
+            URL = SOURCE["zst_url"]
+            SHA256 = SOURCE["zst_sha256"]
+
+        if self._stream_downloads:
+            URL = self._fastest_mirror(URL)
+
+        CACHE_FOLDER = self.conf.get("user.llvm:toolchain_cache")
+        if CACHE_FOLDER:
+            self._extract_cached(URL, SHA256, Path(CACHE_FOLDER))
+        else:
+            self._extract(URL, SHA256, self.package_folder)
 
         if VARIANT == "arm-embedded":
             # Download & install the missing `clang-scan-deps` from  ARM
             # toolchain (ARM's LLVM fork) does not include the binary. These
             # binaries were taken from the upstream LLVM project and added to this
-            # directory.
+            # directory. Installed after the extraction, which clears the
+            # package folder when an archive fails verification.
             self._download_and_install_clang_scan_deps(BUILD_OS, BUILD_ARCH)
-        self._extract(URL, SHA256)
 
-    def setup_arm_cortex_m(self):
+        if self.options.slim:
+            self._slim_package()
+
+    def _fastest_mirror(self, urls) -> str:
+        """Returns the first mirror to answer when conandata.yml lists
+        several urls for the same archive"""
+        if isinstance(urls, str):
+            return urls
+        if len(urls) == 1:
+            return urls[0]
+
+        def probe(url: str) -> str:
+            with _urlopen(url, "0-0", timeout=_MIRROR_TIMEOUT):
+                return url
+
+        executor = ThreadPoolExecutor(max_workers=len(urls))
+        FUTURES = {executor.submit(probe, url): url for url in urls}
+        try:
+            for future in as_completed(FUTURES):
+                if future.exception() is None:
+                    self.output.info(f"Using mirror {FUTURES[future]}")
+                    return FUTURES[future]
+                self.output.warning(f"Mirror {FUTURES[future]} is not "
+                                    f"available: {future.exception()}")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        # No mirror answered, the download of the first one reports the
+        # error after its retries.
+        return urls[0]
+
+    def _slim_package(self):
+        ROOT = Path(self.package_folder)
+        for pattern in _SLIM_PRUNE:
+            for path in ROOT.glob(pattern):
+                self.output.debug(f"slim: removing {path}")
+                if path.is_dir() and not path.is_symlink():
+                    shutil.rmtree(path)
+                else:
+                    path.unlink()
+
+    def _extract_cached(self, url: str, sha256: str, cache_folder: Path):
+        # Extracted toolchains are stored by archive checksum, so every package
+        # revision that resolves to the same archive shares a single download
+        # and extraction. The staging folder is renamed into place only once
+        # extraction finishes, so an existing entry is always complete.
+        TOOLCHAIN = cache_folder / sha256
+        with _file_lock(cache_folder / f"{sha256}.lock"):
+            if TOOLCHAIN.is_dir():
+                self.output.info(f"Using cached toolchain {TOOLCHAIN}")
+            else:
+                STAGING = cache_folder / f"{sha256}.tmp"
+                shutil.rmtree(STAGING, ignore_errors=True)
+                self._extract(url, sha256, str(STAGING))
+                os.replace(STAGING, TOOLCHAIN)
+
+        if self.conf.get("user.llvm:toolchain_cache_symlinks",
+                         default=False, check_type=bool):
+            _link_tree(TOOLCHAIN, Path(self.package_folder))
+        else:
+            _clone_tree(TOOLCHAIN, Path(self.package_folder))
+
+    def setup_arm_cortex_m(self, c_flags: list, cxx_flags: list,
+                           exelinkflags: list):
         # Configure CMake for cross-compilation
         self.conf_info.define(
             "tools.cmake.cmaketoolchain:system_name", "Generic")
         self.conf_info.define(
             "tools.cmake.cmaketoolchain:system_processor", "ARM")
 
-        # Architecture-specific flags for ARM Cortex-M
-        ARCH_MAP = {
-            "cortex-m0": {
-                "target": "armv6m-none-eabi",
-                "cpu": "cortex-m0",
-                "float_abi": "soft"
-            },
-            "cortex-m0plus": {
-                "target": "armv6m-none-eabi",
-                "cpu": "cortex-m0plus",
-                "float_abi": "soft"
-            },
-            "cortex-m1": {
-                "target": "armv6m-none-eabi",
-                "cpu": "cortex-m1",
-                "float_abi": "soft"
-            },
-            "cortex-m3": {
-                "target": "armv7m-none-eabi",
-                "cpu": "cortex-m3",
-                "float_abi": "soft"
-            },
-            "cortex-m4": {
-                "target": "armv7em-none-eabi",
-                "cpu": "cortex-m4",
-                "float_abi": "soft"
-            },
-            "cortex-m4f": {
-                "target": "armv7em-none-eabihf",
-                "cpu": "cortex-m4",
-                "float_abi": "hard",
-                "fpu": "fpv4-sp-d16"
-            },
-            "cortex-m7": {
-                "target": "armv7em-none-eabi",
-                "cpu": "cortex-m7",
-                "float_abi": "soft"
-            },
-            "cortex-m7f": {
-                "target": "armv7em-none-eabihf",
-                "cpu": "cortex-m7",
-                "float_abi": "hard",
-                "fpu": "fpv5-sp-d16"
-            },
-            "cortex-m7d": {
-                "target": "armv7em-none-eabihf",
-                "cpu": "cortex-m7",
-                "float_abi": "hard",
-                "fpu": "fpv5-d16"
-            },
-            "cortex-m23": {
-                "target": "armv8m.base-none-eabi",
-                "cpu": "cortex-m23",
-                "float_abi": "soft"
-            },
-            "cortex-m33": {
-                "target": "armv8m.main-none-eabi",
-                "cpu": "cortex-m33",
-                "float_abi": "soft"
-            },
-            "cortex-m33f": {
-                "target": "armv8m.main-none-eabihf",
-                "cpu": "cortex-m33",
-                "float_abi": "hard",
-                "fpu": "fpv5-sp-d16"
-            },
-            "cortex-m35pf": {
-                "target": "armv8m.main-none-eabihf",
-                "cpu": "cortex-m35p",
-                "float_abi": "hard",
-                "fpu": "fpv5-sp-d16"
-            },
-            "cortex-m55": {
-                "target": "armv8.1m.main-none-eabi",
-                "cpu": "cortex-m55",
-                "float_abi": "soft"
-            },
-            "cortex-m85": {
-                "target": "armv8.1m.main-none-eabi",
-                "cpu": "cortex-m85",
-                "float_abi": "soft"
-            },
-        }
-
-        c_flags = []
-        cxx_flags = []
-        exelinkflags = []
         definitions = [
             # LLVM's libc++ implementation needs a definition for the threads
             # API. Without this, the libc++ headers will emit a compile time
@@ -347,34 +1441,14 @@ class LLVMToolchainPackage(ConanFile):
         if self.options.default_linker_script:
             exelinkflags.append("-Wl,--default-script=picolibcpp.ld")
 
-        if (self.options.default_arch and self.settings_target and
-                self.settings_target.get_safe('arch') in ARCH_MAP):
-            ARCH_CONFIG = ARCH_MAP[self.settings_target.get_safe('arch')]
-
-            # Add target triple
-            target_flag = f"-target {ARCH_CONFIG['target']}"
-            c_flags.append(target_flag)
-            cxx_flags.append(target_flag)
-            exelinkflags.append(target_flag)
-
-            # Add CPU specification
-            cpu_flag = f"-mcpu={ARCH_CONFIG['cpu']}"
-            c_flags.append(cpu_flag)
-            cxx_flags.append(cpu_flag)
-            exelinkflags.append(cpu_flag)
-
-            # Add float ABI
-            float_flag = f"-mfloat-abi={ARCH_CONFIG['float_abi']}"
-            c_flags.append(float_flag)
-            cxx_flags.append(float_flag)
-            exelinkflags.append(float_flag)
-
-            # Add FPU if specified
-            if "fpu" in ARCH_CONFIG:
-                fpu_flag = f"-mfpu={ARCH_CONFIG['fpu']}"
-                c_flags.append(fpu_flag)
-                cxx_flags.append(fpu_flag)
-                exelinkflags.append(fpu_flag)
+        ARCH_CONFIG = None
+        if self.options.default_arch and self.settings_target:
+            ARCH_CONFIG = _ARCH_MAP.get(self._target_info.arch)
+
+        if ARCH_CONFIG is not None:
+            c_flags.extend(ARCH_CONFIG["flags"])
+            cxx_flags.extend(ARCH_CONFIG["flags"])
+            exelinkflags.extend(ARCH_CONFIG["flags"])
 
         if self.options.use_semihosting:
             SEMIHOST = ["-nostartfiles", "-lcrt0-semihost", "-lsemihost"]
@@ -384,48 +1458,24 @@ class LLVMToolchainPackage(ConanFile):
         self.output.info(f'cxx_flags: {cxx_flags}')
         self.output.info(f'exelinkflags: {exelinkflags}')
 
-        self.conf_info.append("tools.build:cflags", c_flags)
-        self.conf_info.append("tools.build:cxxflags", cxx_flags)
-        self.conf_info.append("tools.build:exelinkflags", exelinkflags)
         self.conf_info.append("tools.build:defines", definitions)
 
     @property
     def _lib_path(self) -> Path:
         return Path(self.package_folder) / "lib"
 
-    def add_common_flags(self):
-        c_flags = []
-        cxx_flags = []
-        exelinkflags = ["-fuse-ld=lld "]
-
-        if self.options.lto:
-            c_flags.append("-flto ")
-            cxx_flags.append("-flto ")
-            exelinkflags.append("-flto ")
-
-        if self.options.function_sections:
-            c_flags.append("-ffunction-sections ")
-            cxx_flags.append("-ffunction-sections ")
-
-        if self.options.data_sections:
-            c_flags.append("-fdata-sections ")
-            cxx_flags.append("-fdata-sections ")
-
-        if self.options.gc_sections:
-            if self.settings_target:
-                if self.settings_target.get_safe("os") == "Macos":
-                    exelinkflags.append("-Wl,-dead_strip ")
-                elif self.settings_target.get_safe("os") != "Windows":
-                    exelinkflags.append("-Wl,--gc-sections ")
-                else:
-                    pass
-                    # LLVM will apply gc-sections automatically for Windows
+    def add_common_flags(self, c_flags: list, cxx_flags: list,
+                         exelinkflags: list):
+        ENABLED = frozenset(name for name in _COMMON_FLAG_OPTIONS
+                            if getattr(self.options, name))
+        COMPILE_FLAGS, LINK_FLAGS = _common_flags(
+            self._target_info.os, bool(self.settings_target), ENABLED)
 
-        self.conf_info.append("tools.build:cflags", c_flags)
-        self.conf_info.append("tools.build:cxxflags", cxx_flags)
-        self.conf_info.append("tools.build:exelinkflags", exelinkflags)
+        c_flags.extend(COMPILE_FLAGS)
+        cxx_flags.extend(COMPILE_FLAGS)
+        exelinkflags.extend(LINK_FLAGS)
 
-    def setup_linux(self):
+    def setup_linux(self, c_flags: list, cxx_flags: list, exelinkflags: list):
         self.cpp_info.libdirs = []
 
         library_path = ""
@@ -434,17 +1484,20 @@ class LLVMToolchainPackage(ConanFile):
         elif self.settings.arch == "armv8":
             library_path = self._lib_path / "aarch64-unknown-linux-gnu"
 
-        EXELINKFLAGS = [
-            f"-Wl,-rpath,{str(library_path)} "
-            f"-L{str(library_path)} ",
-            "-lc++ "
-            "-lc++abi "
-        ]
-
-        for flag in EXELINKFLAGS:
-            self.conf_info.append("tools.build:exelinkflags", flag)
-
-    def setup_windows(self):
+        exelinkflags.extend([
+            # Only record the shared libraries that are actually used and
+            # emit the GNU hash table alone, which the dynamic loader looks
+            # symbols up in faster than the SysV one.
+            "-Wl,--as-needed",
+            "-Wl,--hash-style=gnu",
+            f"-Wl,-rpath,{str(library_path)}",
+            f"-L{str(library_path)}",
+            "-lc++",
+            "-lc++abi",
+        ])
+
+    def setup_windows(self, c_flags: list, cxx_flags: list,
+                      exelinkflags: list):
         # This may look a bit odd but the gnu:disable_flag instructs Conan
         # to ignore the host profile's libcxx settings with regards to the
         # generated conan_toolchain.cmake file.
@@ -454,7 +1507,8 @@ class LLVMToolchainPackage(ConanFile):
         # unused.
         self.conf_info.append("tools.gnu:disable_flags", 'libcxx')
 
-    def setup_mac_osx(self):
+    def setup_mac_osx(self, c_flags: list, cxx_flags: list,
+                      exelinkflags: list):
         # Disable Conan's automatic library directories
         self.cpp_info.libdirs = []
 
@@ -509,32 +1563,33 @@ class LLVMToolchainPackage(ConanFile):
         self.buildenv_info.define("GDB", "lldb")
 
         # Determine which OS we're targeting
-        target_os = None
-        target_arch = None
-        if self.settings_target:
-            target_os = self.settings_target.get_safe('os')
-            target_arch = self.settings_target.get_safe('arch')
-        else:
-            # Native build - target is same as host
-            target_os = str(self.settings.os)
-            target_arch = str(self.settings.arch)
-
-        if target_os:
-            self.add_common_flags()
-            if target_os == 'Macos':
-                self.setup_mac_osx()
-            elif target_os == 'Linux':
-                self.setup_linux()
-            elif target_os == 'Windows':
-                self.setup_windows()
-            elif target_os == 'baremetal':
-                if target_arch and target_arch.startswith('cortex-m'):
-                    self.setup_arm_cortex_m()
+        TARGET = self._target_info
+
+        if TARGET.os:
+            # Every setup method adds to the same flag lists so each conf key
+            # is appended exactly once below.
+            c_flags = []
+            cxx_flags = []
+            exelinkflags = []
+
+            self.add_common_flags(c_flags, cxx_flags, exelinkflags)
+            SETUP = self._OS_SETUP.get(TARGET.os)
+            if (TARGET.os == "baremetal" and TARGET.arch and
+                    TARGET.arch.startswith("cortex-m")):
+                SETUP = "setup_arm_cortex_m"
+            if SETUP:
+                getattr(self, SETUP)(c_flags, cxx_flags, exelinkflags)
+
+            self.conf_info.append("tools.build:cflags", c_flags)
+            self.conf_info.append("tools.build:cxxflags", cxx_flags)
+            self.conf_info.append("tools.build:exelinkflags", exelinkflags)
 
     def package_id(self):
         # All options should be removed as none of them should impact the
         # package id hash. These options are only used for delivering command
-        # line arguments via the package_info.
+        # line arguments via the package_info. package_id() may not read
+        # self.options, so slim is taken from the package info before that.
+        SLIM = bool(self.info.options.slim)
         self.info.options.clear()
 
         # Clear all settings - only the variant matters
@@ -543,3 +1598,8 @@ class LLVMToolchainPackage(ConanFile):
         # Only keep the variant in the package_id
         variant = self._determine_llvm_variant()
         self.info.conf.define("user.llvm:variant", variant)
+
+        # A slim package holds different files, so it cannot share the full
+        # package's id. Full packages keep the id they always had.
+        if SLIM:
+            self.info.conf.define("user.llvm:slim", True)
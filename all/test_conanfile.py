@@ -0,0 +1,518 @@
+#!/usr/bin/python
+#
+# Copyright 2024 - 2025 Khalil Estell and the libhal contributors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Checks for the recipe's flags, downloads, extraction, package id and
+validation
+
+Run with `python -m unittest discover all` (or pytest). Only Conan and the
+standard library are needed, every download is served from localhost.
+"""
+
+import hashlib
+import http.server
+import importlib.util
+import io
+import json
+import os
+import re
+import subprocess
+import sys
+import tarfile
+import tempfile
+import threading
+import types
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from conan.errors import ConanException
+
+_SPEC = importlib.util.spec_from_file_location(
+    "llvm_toolchain_conanfile", Path(__file__).with_name("conanfile.py"))
+recipe = importlib.util.module_from_spec(_SPEC)
+_SPEC.loader.exec_module(recipe)
+
+# Several chunks of _RangeReader.CHUNK_SIZE as patched below, and a partial
+# last one
+_DATA = os.urandom(10 * 1000 + 123)
+_CHUNK_SIZE = 1000
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Serves _DATA under a few paths that behave like different servers
+
+    /ranged   honours range requests
+    /whole    ignores them and always sends the whole file
+    /unsized  honours them but leaves the size out of Content-Range
+    /broken   fails every request but the probe
+    /redirect redirects to /signed with a token that is refused after four
+              requests, like GitHub's expiring CDN links
+    """
+
+    protocol_version = "HTTP/1.1"
+    tokens = {}
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b"", headers: dict = None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_range(self, size_text: str = None):
+        MATCH = re.fullmatch(r"bytes=(\d+)-(\d+)",
+                             self.headers.get("Range", ""))
+        if not MATCH:
+            return self._send(200, _DATA)
+        START, END = int(MATCH[1]), min(int(MATCH[2]), len(_DATA) - 1)
+        SIZE = size_text or str(len(_DATA))
+        self._send(206, _DATA[START:END + 1],
+                   {"Content-Range": f"bytes {START}-{END}/{SIZE}"})
+
+    def do_GET(self):
+        PATH, _, QUERY = self.path.partition("?")
+        if PATH == "/ranged":
+            self._send_range()
+        elif PATH == "/whole":
+            self._send(200, _DATA)
+        elif PATH == "/unsized":
+            self._send_range("*")
+        elif PATH == "/broken":
+            if self.headers.get("Range") == "bytes=0-0":
+                return self._send_range()
+            self._send(500)
+        elif PATH == "/redirect":
+            TOKEN = str(len(self.tokens))
+            self.tokens[TOKEN] = 4
+            self._send(302, headers={"Location": f"/signed?token={TOKEN}"})
+        elif PATH == "/signed" and self.tokens.get(QUERY[len("token="):]):
+            self.tokens[QUERY[len("token="):]] -= 1
+            self._send_range()
+        else:
+            self._send(403)
+
+
+class _Conf:
+    """Stand-in for the recipe's conf, returns the defaults unless set"""
+
+    def __init__(self, values: dict):
+        self._values = values
+
+    def get(self, name, default=None, check_type=None):
+        return self._values.get(name, default)
+
+
+def _recipe(conf: dict = None):
+    conanfile = recipe.LLVMToolchainPackage("test")
+    conanfile.conf = _Conf(conf or {})
+    return conanfile
+
+
+def _tar_xz(members: dict) -> bytes:
+    """An xz compressed tarball of members, name to contents, where a
+    contents of ("symlink", target) or ("hardlink", target) adds a link"""
+    BUFFER = io.BytesIO()
+    with tarfile.open(fileobj=BUFFER, mode="w:xz") as archive:
+        for name, contents in members.items():
+            info = tarfile.TarInfo(name)
+            if isinstance(contents, tuple):
+                KIND, info.linkname = contents
+                info.type = (tarfile.SYMTYPE if KIND == "symlink"
+                             else tarfile.LNKTYPE)
+                archive.addfile(info)
+            else:
+                info.size = len(contents)
+                archive.addfile(info, io.BytesIO(contents))
+    return BUFFER.getvalue()
+
+
+class ReaderTests(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = http.server.ThreadingHTTPServer(
+            ("127.0.0.1", 0), _Handler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_port}"
+        # Proxies from the environment would swallow the localhost requests.
+        # Two workers keep the order of the signed requests predictable.
+        for patcher in (mock.patch.dict(os.environ, {"no_proxy": "*"}),
+                        mock.patch.object(recipe._RangeReader, "CHUNK_SIZE",
+                                          _CHUNK_SIZE),
+                        mock.patch.object(recipe._RangeReader, "WORKERS", 2)):
+            patcher.start()
+            cls.addClassCleanup(patcher.stop)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def _read(self, reader, size: int = 777) -> bytes:
+        with reader:
+            return b"".join(iter(lambda: reader.read(size), b""))
+
+    def test_ranged_server_is_read_in_chunks(self):
+        reader = recipe._open_url(f"{self.base}/ranged")
+        self.assertIsInstance(reader, recipe._RangeReader)
+        self.assertEqual(self._read(reader), _DATA)
+
+    def test_server_without_ranges_is_read_ahead(self):
+        reader = recipe._open_url(f"{self.base}/whole")
+        self.assertIsInstance(reader, recipe._PrefetchReader)
+        self.assertEqual(self._read(reader), _DATA)
+
+    def test_unknown_size_is_read_in_one_piece(self):
+        self.assertEqual(self._read(recipe._open_url(f"{self.base}/unsized")),
+                         _DATA)
+
+    def test_expired_redirect_is_resolved_again(self):
+        reader = recipe._open_url(f"{self.base}/redirect")
+        self.assertIsInstance(reader, recipe._RangeReader)
+        self.assertEqual(self._read(reader), _DATA)
+
+    def test_failed_chunk_raises(self):
+        with self.assertRaisesRegex(OSError, "HTTP 500"):
+            self._read(recipe._open_url(f"{self.base}/broken"))
+
+    def test_read_all_at_once(self):
+        self.assertEqual(
+            self._read(recipe._open_url(f"{self.base}/ranged"), -1), _DATA)
+
+    def test_prefetch_reader_raises_stream_errors(self):
+        class Failing(io.BytesIO):
+            def read(self, size=-1):
+                if self.tell():
+                    raise OSError("connection reset")
+                return super().read(size)
+
+        reader = recipe._PrefetchReader(Failing(b"x" * (3 << 20)))
+        with self.assertRaisesRegex(OSError, "connection reset"):
+            self._read(reader)
+
+    def test_single_mirror_is_not_probed(self):
+        conanfile = _recipe()
+        with mock.patch.object(recipe, "_urlopen") as urlopen:
+            self.assertEqual(conanfile._fastest_mirror("http://a"), "http://a")
+            self.assertEqual(conanfile._fastest_mirror(["http://b"]),
+                             "http://b")
+        urlopen.assert_not_called()
+
+    def test_unavailable_mirror_is_skipped(self):
+        self.assertEqual(
+            _recipe()._fastest_mirror([f"{self.base}/missing",
+                                       f"{self.base}/ranged"]),
+            f"{self.base}/ranged")
+
+    def test_first_mirror_is_used_when_none_answers(self):
+        self.assertEqual(
+            _recipe()._fastest_mirror([f"{self.base}/missing",
+                                       f"{self.base}/gone"]),
+            f"{self.base}/missing")
+
+    def test_process_pipe(self):
+        CAT = [sys.executable, "-c",
+               "import shutil, sys; "
+               "shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)"]
+        self.assertEqual(
+            self._read(recipe._ProcessPipe(CAT, io.BytesIO(_DATA))), _DATA)
+
+        FAIL = [sys.executable, "-c", "import sys; sys.exit(3)"]
+        with self.assertRaises(ConanException):
+            self._read(recipe._ProcessPipe(FAIL, io.BytesIO(_DATA)))
+
+
+class ExtractionTests(unittest.TestCase):
+
+    def setUp(self):
+        TEMPORARY = tempfile.TemporaryDirectory()
+        self.addCleanup(TEMPORARY.cleanup)
+        self.folder = Path(TEMPORARY.name)
+
+    def _write(self, name: str, contents: bytes) -> Path:
+        path = self.folder / name
+        path.write_bytes(contents)
+        return path
+
+    def test_unpack_strips_the_top_level_folder(self):
+        DESTINATION = self.folder / "out"
+        ARCHIVE = _tar_xz({
+            "LLVM-20/bin/clang": b"clang",
+            "LLVM-20/bin/clang++": ("symlink", "clang"),
+            "LLVM-20/bin/clang-20": ("hardlink", "LLVM-20/bin/clang"),
+        })
+        recipe._unpack_tar_stream(io.BytesIO(ARCHIVE), "r|xz",
+                                  str(DESTINATION))
+
+        self.assertEqual(sorted(os.listdir(DESTINATION / "bin")),
+                         ["clang", "clang++", "clang-20"])
+        self.assertEqual(os.readlink(DESTINATION / "bin" / "clang++"), "clang")
+        self.assertEqual((DESTINATION / "bin" / "clang-20").read_bytes(),
+                         b"clang")
+
+    def test_unpack_refuses_members_outside_the_destination(self):
+        DESTINATION = self.folder / "a" / "out"
+        ARCHIVE = _tar_xz({"LLVM-20/../../escaped": b"x"})
+        for extract_filter in (None, "missing"):
+            # "missing" names no tarfile filter, so the recipe's own check
+            # has to catch the member.
+            with self.assertRaises((ConanException, tarfile.TarError)):
+                recipe._unpack_tar_stream(io.BytesIO(ARCHIVE), "r|xz",
+                                          str(DESTINATION), extract_filter)
+            self.assertFalse((self.folder / "escaped").exists())
+
+    def test_checksum_mismatch_removes_the_extraction(self):
+        ARCHIVE = self._write("llvm.tar.xz",
+                              _tar_xz({"LLVM-20/bin/clang": b"clang"}))
+        DESTINATION = self.folder / "out"
+        with self.assertRaisesRegex(ConanException, "sha256"):
+            _recipe()._stream_extract_tar(ARCHIVE.as_uri(), "0" * 64,
+                                          str(DESTINATION))
+        self.assertFalse(DESTINATION.exists())
+
+    def test_failed_stream_falls_back_to_conan(self):
+        conanfile = _recipe()
+        with mock.patch.object(conanfile, "_stream_extract_tar",
+                               side_effect=OSError("proxy required")), \
+                mock.patch("conan.tools.files.get") as get:
+            conanfile._extract("https://example.com/LLVM-20.tar.xz", "0" * 64,
+                               str(self.folder / "out"))
+        get.assert_called_once_with(
+            conanfile, "https://example.com/LLVM-20.tar.xz", sha256="0" * 64,
+            strip_root=True, destination=str(self.folder / "out"))
+
+        with mock.patch.object(conanfile, "_stream_download",
+                               side_effect=OSError("proxy required")), \
+                mock.patch("conan.tools.files.download") as download:
+            conanfile._download("https://example.com/clang-scan-deps",
+                                "0" * 64, self.folder / "clang-scan-deps")
+        download.assert_called_once_with(
+            conanfile, "https://example.com/clang-scan-deps",
+            str(self.folder / "clang-scan-deps"), sha256="0" * 64)
+
+    def test_corrupt_cached_download_is_replaced(self):
+        SOURCE = self._write("clang-scan-deps", b"clang-scan-deps")
+        SHA256 = hashlib.sha256(SOURCE.read_bytes()).hexdigest()
+        conanfile = _recipe({"user.llvm:download_cache": str(self.folder)})
+        CACHED = conanfile._download_cache_file(SHA256)
+        CACHED.parent.mkdir(parents=True)
+        CACHED.write_bytes(b"CORRUPT")
+
+        TARGET = self.folder / "installed"
+        conanfile._cached_download(SOURCE.as_uri(), SHA256, TARGET)
+        self.assertEqual(TARGET.read_bytes(), b"clang-scan-deps")
+        self.assertEqual(CACHED.read_bytes(), b"clang-scan-deps")
+
+    def test_toolchain_folders_in_a_volume_folder(self):
+        # 7-Zip can name the volume folder after the toolchain as well
+        (self.folder / "ATfE-20" / "ATfE-20" / "bin").mkdir(parents=True)
+        (self.folder / "ATfE-20" / "ATfE-20" / "lib" / "bin").mkdir(
+            parents=True)
+        self.assertEqual(recipe._toolchain_folders(self.folder),
+                         [self.folder / "ATfE-20" / "ATfE-20"])
+
+    def test_toolchain_folders_at_the_root(self):
+        (self.folder / "LLVM-20" / "bin").mkdir(parents=True)
+        (self.folder / "LLVM-20" / "LLVM-nested" / "bin").mkdir(parents=True)
+        self.assertEqual(recipe._toolchain_folders(self.folder),
+                         [self.folder / "LLVM-20"])
+
+    def test_clone_tree(self):
+        SOURCE = self.folder / "src"
+        (SOURCE / "bin").mkdir(parents=True)
+        (SOURCE / "bin" / "clang").write_bytes(b"clang")
+        (SOURCE / "bin" / "clang++").symlink_to("clang")
+
+        DESTINATION = self.folder / "dst"
+        recipe._clone_tree(SOURCE, DESTINATION)
+        self.assertEqual((DESTINATION / "bin" / "clang").read_bytes(),
+                         b"clang")
+        self.assertEqual(os.readlink(DESTINATION / "bin" / "clang++"),
+                         "clang")
+
+    def test_slim_keeps_what_building_needs(self):
+        KEPT = ["bin/clang", "include/c++/v1/vector", "lib/libc++.a",
+                "lib/libc++.modules.json", "share/libc++/v1/std.cppm"]
+        PRUNED = ["bin/clang.pdb", "bin/clangd", "include/llvm/IR/Module.h",
+                  "lib/cmake/llvm/LLVMConfig.cmake", "lib/libLLVMCore.a",
+                  "libexec/ccc-analyzer", "share/doc/LLVM/README.txt",
+                  "share/man/man1/clang.1", "share/scan-view/ScanView.py"]
+        for name in KEPT + PRUNED:
+            (self.folder / name).parent.mkdir(parents=True, exist_ok=True)
+            (self.folder / name).write_bytes(b"")
+
+        conanfile = _recipe()
+        conanfile.folders.set_base_package(str(self.folder))
+        conanfile._slim_package()
+        self.assertEqual(
+            sorted(path.relative_to(self.folder).as_posix()
+                   for path in self.folder.rglob("*") if path.is_file()),
+            KEPT)
+
+
+class FlagTests(unittest.TestCase):
+
+    def _flags(self, target_os: str, *enabled, cross_building: bool = True):
+        return recipe._common_flags(target_os, cross_building,
+                                    frozenset(enabled))
+
+    def test_fat_lto_compiles_and_links_with_bitcode(self):
+        COMPILE, LINK = self._flags("baremetal", "lto", "fat_lto")
+        self.assertIn("-ffat-lto-objects", COMPILE)
+        self.assertIn("-ffat-lto-objects", LINK)
+        self.assertIn("-flto", LINK)
+
+    def test_fat_lto_only_applies_to_elf(self):
+        for target_os in ("Macos", "Windows"):
+            COMPILE, LINK = self._flags(target_os, "lto", "fat_lto")
+            self.assertNotIn("-ffat-lto-objects", COMPILE + LINK)
+
+    def test_thin_lto(self):
+        COMPILE, LINK = self._flags("Linux", "lto", "thin_lto")
+        self.assertIn("-flto=thin", COMPILE)
+        self.assertIn("-flto=thin", LINK)
+        self.assertEqual(self._flags("Linux", "thin_lto"),
+                         ((), ("-fuse-ld=lld",)))
+
+    def test_gc_sections_per_linker(self):
+        self.assertEqual(self._flags("Linux", "gc_sections")[1],
+                         ("-fuse-ld=lld", "-Wl,--gc-sections"))
+        self.assertEqual(self._flags("Macos", "gc_sections")[1],
+                         ("-fuse-ld=lld", "-Wl,-dead_strip",
+                          "-Wl,-dead_strip_dylibs"))
+        self.assertEqual(self._flags("Windows", "gc_sections")[1],
+                         ("-fuse-ld=lld",))
+        self.assertEqual(self._flags("Linux", "gc_sections",
+                                     cross_building=False)[1],
+                         ("-fuse-ld=lld",))
+
+    def test_elf_only_link_flags(self):
+        self.assertEqual(self._flags("baremetal", "icf", "strip_build_id")[1],
+                         ("-fuse-ld=lld", "-Wl,--icf=safe",
+                          "-Wl,--build-id=none"))
+        self.assertEqual(self._flags("Macos", "icf", "strip_build_id")[1],
+                         ("-fuse-ld=lld",))
+
+    def test_sections(self):
+        self.assertEqual(
+            self._flags("baremetal", "function_sections", "data_sections")[0],
+            ("-ffunction-sections", "-fdata-sections"))
+
+    def test_arch_flags_are_shared_between_calls(self):
+        conanfile = _recipe()
+        conanfile.options = types.SimpleNamespace(
+            default_linker_script=False, default_arch=True,
+            use_semihosting=False)
+        conanfile.settings_target = object()
+        conanfile._target_info = recipe._TargetInfo(
+            "baremetal", "cortex-m4f", "arm-embedded")
+        FLAGS = recipe._ARCH_MAP["cortex-m4f"]["flags"]
+
+        # The table is built at import, setup_arm_cortex_m() only reads it
+        with mock.patch.object(recipe, "_arch_flags") as arch_flags:
+            for _ in range(2):
+                c_flags = []
+                conanfile.setup_arm_cortex_m(c_flags, [], [])
+                self.assertEqual(c_flags, list(FLAGS))
+        arch_flags.assert_not_called()
+        self.assertIs(recipe._ARCH_MAP["cortex-m4f"]["flags"], FLAGS)
+        self.assertEqual(FLAGS, ("-target", "armv7em-none-eabihf",
+                                 "-mcpu=cortex-m4", "-mfloat-abi=hard",
+                                 "-mfpu=fpv4-sp-d16"))
+
+
+def _graph_node(*arguments, version: str = "20") -> dict:
+    """The recipe's node in the graph `conan graph info` computes, with
+    arguments added to its command line
+
+    Runs in a throwaway Conan home with a Linux x86_64 default profile and a
+    cortex-m4 profile. The Cortex-M architectures come from libhal's Conan
+    configuration, so the home declares the one it uses itself.
+    """
+    with tempfile.TemporaryDirectory() as home:
+        Path(home, "settings_user.yml").write_text("arch: [cortex-m4]\n")
+        PROFILES = Path(home, "profiles")
+        PROFILES.mkdir()
+        (PROFILES / "default").write_text(
+            "[settings]\nos=Linux\narch=x86_64\nbuild_type=Release\n")
+        (PROFILES / "cortex-m4").write_text(
+            "[settings]\nos=baremetal\narch=cortex-m4\nbuild_type=Release\n")
+        RESULT = subprocess.run(
+            [sys.executable, "-m", "conans.conan", "graph", "info",
+             str(Path(__file__).parent), f"--version={version}",
+             "--format=json", *arguments],
+            env={**os.environ, "CONAN_HOME": home}, capture_output=True,
+            text=True)
+    if RESULT.returncode != 0:
+        raise AssertionError(RESULT.stderr)
+    return json.loads(RESULT.stdout)["graph"]["nodes"]["0"]
+
+
+def _package_id_info(*arguments) -> dict:
+    return _graph_node(*arguments)["info"]
+
+
+class PackageIdTests(unittest.TestCase):
+
+    def test_native_build_uses_upstream(self):
+        self.assertEqual(_package_id_info(),
+                         {"conf": {"user.llvm:variant": "upstream"}})
+
+    def test_build_require_keeps_only_the_variant(self):
+        self.assertEqual(
+            _package_id_info("--build-require", "-o:b", "&:lto=False",
+                             "-o:b", "&:gc_sections=False"),
+            {"conf": {"user.llvm:variant": "upstream"}})
+
+    def test_cortex_m_target_uses_arm_embedded(self):
+        self.assertEqual(
+            _package_id_info("--build-require", "-pr:h", "cortex-m4"),
+            {"conf": {"user.llvm:variant": "arm-embedded"}})
+
+    def test_slim_gets_its_own_package_id(self):
+        self.assertEqual(
+            _package_id_info("--build-require", "-o:b", "&:slim=True"),
+            {"conf": {"user.llvm:variant": "upstream",
+                      "user.llvm:slim": True}})
+
+
+
+class ValidateTests(unittest.TestCase):
+
+    def test_supported_configurations(self):
+        self.assertIsNone(_graph_node()["info_invalid"])
+        self.assertIsNone(_graph_node("--build-require", "-pr:h",
+                                      "cortex-m4")["info_invalid"])
+
+    def test_unsupported_build_os(self):
+        self.assertIn("The build os 'FreeBSD' is not supported",
+                      _graph_node("-s:b", "os=FreeBSD")["info_invalid"])
+
+    def test_unsupported_build_arch(self):
+        self.assertIn("The build architecture 'x86' is not supported",
+                      _graph_node("-s:b", "arch=x86")["info_invalid"])
+
+    def test_unknown_version(self):
+        self.assertIn("Version 18 is not defined in conandata.yml",
+                      _graph_node("--build-require", version="18")
+                      ["info_invalid"])
+
+if __name__ == "__main__":
+    unittest.main()